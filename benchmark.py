@@ -0,0 +1,337 @@
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from decimal import Decimal
+
+from main import (convert_amount, parse_amount, AmountParser, convert_date, cache_stats, iter_csv,
+                  iter_batches, Transaction, detect_delimiter, sniff_delimiter, DELIMITER_CANDIDATES,
+                  infer_column_mapping, normalize_row, process_csv, TRANSACTION_FIELDS,
+                  parse_minor_units, sum_minor_units, aggregate)
+
+def make_amounts(n: int, distinct: int = 5000, seed: int = 0, european: bool = None) -> list:
+    """
+    Build a list of n amount strings drawn from a pool of distinct values.
+
+    The pool mixes U.S. and European values half and half, or holds only one
+    style when european is True or False.
+    """
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        whole, cents = rng.randint(0, 999999), rng.randint(0, 99)
+        if european is False or (european is None and rng.random() < 0.5):
+            pool.append(f"{whole:,}.{cents:02d}")
+        else:
+            pool.append(f"{whole:,}".replace(',', '.') + f",{cents:02d}")
+    return [rng.choice(pool) for _ in range(n)]
+
+def make_csv_text(rows: int, delimiter: str = ',', header: bool = True, european: bool = False,
+                  quoted: bool = False, seed: int = 0) -> str:
+    """
+    Build the text of a synthetic transaction export.
+
+    european switches amounts to "1.234,56" style; quoted puts other
+    delimiters inside quoted descriptions, which trips up naive detectors.
+    """
+    rng = random.Random(seed)
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=delimiter, lineterminator='\n')
+    if header:
+        writer.writerow(["Transaction_Date", "Description", "Amount", "Currency", "Status"])
+    for i in range(rows):
+        amount = f"{rng.randint(0, 999999):,}.{rng.randint(0, 99):02d}"
+        if european:
+            amount = amount.replace(',', ' ').replace('.', ',').replace(' ', '.')
+        description = f"Item {i}"
+        if quoted and i % 3 == 0:
+            description = f"Item {i}, part {i % 7}; ref|{i % 5}"
+        writer.writerow([f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", description, amount,
+                         rng.choice(["USD", "EUR", "GBP"]), rng.choice(["COMPLETED", "pending", "Failed"])])
+    return out.getvalue()
+
+def delimiter_corpus(rows: int = 40) -> list:
+    """
+    Return (name, sample, expected delimiter) for every synthetic variant and the repo's sample files.
+    """
+    corpus = []
+    seed = 0
+    for delimiter in DELIMITER_CANDIDATES:
+        for header in (True, False):
+            for european in (False, True):
+                for quoted in (False, True):
+                    seed += 1
+                    text = make_csv_text(rows, delimiter, header, european, quoted, seed)
+                    name = f"synthetic {delimiter!r} header={header} eu={european} quoted={quoted}"
+                    corpus.append((name, text[:1024], delimiter))
+    for name, delimiter in (("test1.csv", ','), ("test2.csv", ';'), ("test3.csv", '|'), ("no_header.csv", ',')):
+        if os.path.exists(name):
+            with open(name, newline='', encoding='utf-8') as f:
+                corpus.append((name, f.read(1024), delimiter))
+    return corpus
+
+def bench_delimiters(repeat: int):
+    """
+    Compare accuracy and speed of detect_delimiter and the csv.Sniffer based sniff_delimiter.
+    """
+    corpus = delimiter_corpus()
+    samples = [sample for _, sample, _ in corpus]
+    print(f"delimiters: {len(corpus)} samples, {repeat:,} passes")
+    for name, func in (("sniff_delimiter", sniff_delimiter), ("detect_delimiter", detect_delimiter)):
+        wrong = [case for case, sample, expected in corpus if func(sample) != expected]
+        seconds = time_it(lambda _: [func(sample) for sample in samples], range(repeat))
+        per_call = seconds / (repeat * len(samples)) * 1e6
+        print(f"  {name:<18} {len(corpus) - len(wrong)}/{len(corpus)} correct  {per_call:8.1f} us/sample")
+        for case in wrong:
+            print(f"    wrong: {case}")
+
+def time_it(func, values: list) -> float:
+    """
+    Return the seconds taken to apply func to every value.
+    """
+    start = time.perf_counter()
+    for value in values:
+        func(value)
+    return time.perf_counter() - start
+
+def bench_amounts(n: int, distinct: int):
+    """
+    Compare convert_amount against the memoized parse_amount and a per-file AmountParser.
+
+    A per-file parser locks in one style, so it is timed on a single-locale
+    pool (as a real file is); the other two also get the mixed pool.
+    """
+    mixed = make_amounts(n, distinct)
+    single = make_amounts(n, distinct, european=False)
+    for amounts in (mixed, single):
+        sample = amounts[:distinct]
+        assert [parse_amount(a) for a in sample] == [convert_amount(a) for a in sample]
+    assert [AmountParser()(a) for a in single[:distinct]] == [convert_amount(a) for a in single[:distinct]]
+    parse_amount.cache_clear()
+    results = [
+        ("convert_amount", time_it(convert_amount, single)),
+        ("parse_amount", time_it(parse_amount, single)),
+        ("AmountParser", time_it(AmountParser(), single)),
+        ("convert_amount (mixed)", time_it(convert_amount, mixed)),
+        ("parse_amount (mixed)", time_it(parse_amount, mixed)),
+    ]
+    print(f"amounts: {n:,} values, {distinct:,} distinct (U.S. pool, then U.S./European mix)")
+    baseline = results[0][1]
+    for name, seconds in results:
+        print(f"  {name:<22} {seconds:8.2f}s  {n / seconds:14,.0f} values/s  x{baseline / seconds:.1f}")
+
+def bench_minor_units(n: int, distinct: int, rows: int = 200_000):
+    """
+    Compare Decimal amounts with int minor units: parsing, summing, memory and a file aggregated end-to-end.
+    """
+    amounts = make_amounts(n, distinct)
+    print(f"minor units: {n:,} values, {distinct:,} distinct")
+    parsers = (
+        ("Decimal", parse_amount, lambda values: sum(values, Decimal(0))),
+        ("int minor units", parse_minor_units, sum),
+    )
+    for name, parse, total in parsers:
+        parse.cache_clear()
+        cached = time_it(parse, amounts)
+        uncached = time_it(parse.__wrapped__, amounts)
+        values = [parse(amount) for amount in amounts]
+        summed = time_it(total, [values])
+        held = measure_bytes(lambda: [parse.__wrapped__(amount) for amount in amounts[:distinct]])
+        print(f"  {name:<16} parse {n / cached:12,.0f}/s cached  {n / uncached:12,.0f}/s uncached  "
+              f"sum {n / summed:14,.0f}/s  {held / distinct:6.1f} bytes/value")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            f.write(make_csv_text(rows))
+        for name, minor_units in (("Decimal", False), ("int minor units", True)):
+            start = time.perf_counter()
+            stream = iter_csv(path, minor_units=minor_units)
+            if minor_units:
+                sum_minor_units(stream)
+            else:
+                aggregate(stream, "currency")
+            seconds = time.perf_counter() - start
+            print(f"  {name:<16} totals per currency of {rows:,} rows in {seconds:.2f}s ({rows / seconds:,.0f} rows/s)")
+
+def make_rows(n: int, seed: int = 0) -> list:
+    """
+    Build n normalized row dictionaries with distinct values.
+    """
+    rng = random.Random(seed)
+    return [{
+        "transaction_date": datetime(2024, 1, 1 + i % 28),
+        "description": f"Item {i}",
+        "amount": parse_amount(f"{rng.randint(0, 999999)}.{rng.randint(0, 99):02d}"),
+        "currency": "USD",
+        "status": "completed",
+    } for i in range(n)]
+
+def measure_bytes(build) -> int:
+    """
+    Return the bytes still allocated after build() returns its result.
+    """
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+def bench_memory(n: int):
+    """
+    Compare the memory held per row by row dictionaries and Transaction records.
+    """
+    rows = make_rows(n)
+    dict_bytes = measure_bytes(lambda: [dict(row) for row in rows])
+    record_bytes = measure_bytes(lambda: [Transaction.from_dict(row) for row in rows])
+    print(f"memory: {n:,} rows (container cost only, field values shared)")
+    print(f"  dict         {dict_bytes / n:8.1f} bytes/row")
+    print(f"  Transaction  {record_bytes / n:8.1f} bytes/row")
+
+def bench_file(file_path: str, has_header: bool):
+    """
+    Stream a real file through iter_csv and report throughput and cache hit rates.
+    """
+    convert_date.cache_clear()
+    parse_amount.cache_clear()
+    start = time.perf_counter()
+    rows = sum(1 for _ in iter_csv(file_path, has_header=has_header))
+    seconds = time.perf_counter() - start
+    print(f"{file_path}: {rows:,} rows in {seconds:.2f}s ({rows / seconds:,.0f} rows/s)")
+    for name, stats in cache_stats().items():
+        print(f"  {name} cache: {stats['hit_rate']:.1%} hit rate "
+              f"({stats['hits']:,} hits, {stats['misses']:,} misses, {stats['size']:,} entries)")
+
+# a stage counts as regressed when its throughput drops by more than this fraction
+REGRESSION_TOLERANCE = 0.10
+
+def time_stage(func, items: list, repeat: int = 1) -> dict:
+    """
+    Time func over every item (repeat times) and return seconds, item count and items per second.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    seconds = time.perf_counter() - start
+    count = len(items) * repeat
+    return {"seconds": seconds, "items": count, "per_second": count / seconds if seconds else 0.0}
+
+def peak_memory(func) -> int:
+    """
+    Return the peak bytes allocated while func runs.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def bench_pipeline(rows: int, delimiter: str, european: bool, header: bool, quoted: bool,
+                   repeat: int = 1000) -> dict:
+    """
+    Time every stage of the pipeline on a synthetic file and return the results.
+
+    detect_delimiter and infer_column_mapping run repeat times on the file's
+    sample and first data row; convert_amount and normalize_row run over every
+    row; process_csv (list), iter_csv (stream) and iter_batches (columns) run end-to-end, with their
+    peak memory measured in a separate run.
+    """
+    text = make_csv_text(rows, delimiter, header, european, quoted)
+    records = list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter))
+    data = records[1:] if header else records
+    row_dicts = [dict(zip(TRANSACTION_FIELDS, record)) for record in data]
+
+    stages = {
+        "detect_delimiter": time_stage(detect_delimiter, [text[:1024]], repeat),
+        "infer_column_mapping": time_stage(infer_column_mapping, [data[0]], repeat),
+        "convert_amount": time_stage(convert_amount, [record[2] for record in data]),
+        "normalize_row": time_stage(normalize_row, row_dicts),
+    }
+    # drop the parsed inputs so the end-to-end runs are not slowed by garbage collector passes over them
+    del records, data, row_dicts
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            f.write(text)
+        end_to_end = {
+            "process_csv": lambda: process_csv(path, has_header=header),
+            "iter_csv": lambda: sum(1 for _ in iter_csv(path, has_header=header)),
+            "iter_batches": lambda: sum(len(batch["amount"]) for batch in iter_batches(path, has_header=header)),
+        }
+        for name, run in end_to_end.items():
+            stages[name] = time_stage(lambda _: run(), [None])
+            stages[name].update(items=rows, per_second=rows / stages[name]["seconds"])
+            stages[name]["peak_memory"] = peak_memory(run)
+
+    config = {"rows": rows, "delimiter": delimiter, "european": european, "header": header, "quoted": quoted}
+    return {"config": config, "stages": stages}
+
+def print_pipeline(results: dict, baseline: dict = None):
+    """
+    Print a per-stage table, comparing throughput with a saved baseline when given.
+    """
+    print(f"pipeline: {results['config']}")
+    if baseline and baseline.get("config") != results["config"]:
+        print(f"  note: baseline was run with a different config: {baseline.get('config')}")
+    for name, stage in results["stages"].items():
+        line = f"  {name:<22} {stage['seconds']:8.3f}s  {stage['per_second']:14,.0f} /s"
+        if "peak_memory" in stage:
+            line += f"  peak {stage['peak_memory'] / 1024 / 1024:8.1f} MiB"
+        old = (baseline or {}).get("stages", {}).get(name)
+        if old and old["per_second"]:
+            ratio = stage["per_second"] / old["per_second"]
+            line += f"  x{ratio:.2f} vs baseline"
+            if ratio < 1 - REGRESSION_TOLERANCE:
+                line += "  REGRESSION"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the normalization pipeline")
+    parser.add_argument("--amounts", type=int, default=10_000_000, help="number of amount strings to parse")
+    parser.add_argument("--distinct", type=int, default=5000, help="number of distinct amount strings")
+    parser.add_argument("--delimiters", type=int, default=0,
+                        help="compare delimiter detectors over this many passes of the corpus instead")
+    parser.add_argument("--memory", type=int, default=0, help="compare bytes per row for this many rows instead")
+    parser.add_argument("--minor-units", type=int, default=0,
+                        help="compare Decimal and int minor-unit amounts on this many values instead")
+    parser.add_argument("--file", help="process this CSV file and report cache hit rates instead")
+    parser.add_argument("--pipeline", action="store_true", help="time every pipeline stage on a synthetic file instead")
+    parser.add_argument("--rows", type=int, default=100_000, help="rows of the synthetic --pipeline file")
+    parser.add_argument("--delimiter", default=",", help="delimiter of the synthetic --pipeline file")
+    parser.add_argument("--european", action="store_true", help="use European amounts in the --pipeline file")
+    parser.add_argument("--quoted", action="store_true", help="add quoted fields to the --pipeline file")
+    parser.add_argument("--save", help="save --pipeline results to this JSON file")
+    parser.add_argument("--compare", help="compare --pipeline results with a previously saved JSON file")
+    parser.add_argument("--no-header", action="store_true", help="the --file or --pipeline file has no header row")
+    args = parser.parse_args()
+    if args.pipeline:
+        results = bench_pipeline(args.rows, args.delimiter, args.european, not args.no_header, args.quoted)
+        baseline = None
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as f:
+                baseline = json.load(f)
+        print_pipeline(results, baseline)
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+    elif args.file:
+        bench_file(args.file, has_header=not args.no_header)
+    elif args.delimiters:
+        bench_delimiters(args.delimiters)
+    elif args.memory:
+        bench_memory(args.memory)
+    elif args.minor_units:
+        bench_minor_units(args.minor_units, args.distinct)
+    else:
+        bench_amounts(args.amounts, args.distinct)
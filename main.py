@@ -1,20 +1,44 @@
+import argparse
+import asyncio
+import bz2
+import codecs
+import collections
+import contextlib
 import csv
+import functools
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import lzma
+import mmap
 import re
+import sqlite3
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime
 from decimal import Decimal
 import os
+import sys
+import threading
+import time
 
+# runs of separators, and word boundaries inside CamelCase (acronyms stay whole: "IBANNumber" -> "IBAN_Number")
+_SNAKE_CASE_SPLIT = re.compile(r'[\s_\-]+|(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])')
+
+@functools.lru_cache(maxsize=4096)
 def snake_case(s: str) -> str:
     """
-    convert a string to snake_case
+    convert a string to snake_case, e.g. "TransactionID" -> "transaction_id"
+    """
+    return _SNAKE_CASE_SPLIT.sub('_', s.strip()).lower()
+
+@functools.lru_cache(maxsize=1024)
+def normalize_headers(headers: tuple) -> tuple:
+    """
+    Normalize a whole header row to snake_case, cached across files sharing the same header line.
     """
-    parts = s.split('_')
-    snake_parts = []
-    for part in parts:
-        new_part = re.sub(r'(?<!^)(?=[A-Z])', '_', part).lower()
-        snake_parts.append(new_part)
-        
-    return re.sub(r'_+', '_', '_'.join(snake_parts))
+    return tuple(snake_case(header) for header in headers)
 
 def convert_amount(amount_str: str) -> Decimal:
     """
@@ -50,7 +74,227 @@ def convert_amount(amount_str: str) -> Decimal:
     except Exception as e:
         raise ValueError(f"Could not convert amount '{amount_str}': {e}")
 
-def detect_delimiter(sample: str) -> str:
+# amount formats recognised by classify_amount
+AMOUNT_US = 'us'        # "1,234.56": comma thousands, dot decimal
+AMOUNT_EU = 'eu'        # "1.234,56": dot thousands, comma decimal
+AMOUNT_PLAIN = 'plain'  # "1234.56" or "1234": no comma at all
+
+# number of distinct amount strings memoized by parse_amount
+AMOUNT_CACHE_SIZE = 65536
+
+def classify_amount(amount_str: str) -> str:
+    """
+    Classify an already cleaned amount string as US, European or plain,
+    using the same rules as convert_amount.
+    """
+    comma = amount_str.rfind(',')
+    if comma < 0:
+        return AMOUNT_PLAIN
+    dot = amount_str.rfind('.')
+    if dot < 0:
+        # Only comma exists: "12,34" is a European decimal, "1,234" a U.S. thousand separator
+        # (the third-last character is checked, not the last comma, exactly as convert_amount does)
+        if len(amount_str) > 3 and amount_str[-3] == ',':
+            return AMOUNT_EU
+        return AMOUNT_US
+    return AMOUNT_EU if comma > dot else AMOUNT_US
+
+def _to_decimal(amount_str: str) -> Decimal:
+    try:
+        return Decimal(amount_str)
+    except Exception as e:
+        raise ValueError(f"Could not convert amount '{amount_str}': {e}")
+
+_AMOUNT_PARSERS = {
+    AMOUNT_US: lambda amount_str: _to_decimal(amount_str.replace(',', '')),
+    AMOUNT_EU: lambda amount_str: _to_decimal(amount_str.replace('.', '').replace(',', '.')),
+    AMOUNT_PLAIN: _to_decimal,
+}
+
+@functools.lru_cache(maxsize=AMOUNT_CACHE_SIZE)
+def parse_amount(amount_str: str, style: str = None) -> Decimal:
+    """
+    Fast, memoized equivalent of convert_amount.
+
+    The format is classified once per distinct string, or skipped entirely when
+    the style is already known. Results are kept in a bounded LRU cache, which
+    pays off since exports repeat the same amounts many times.
+    """
+    amount_str = amount_str.replace('$', '').strip()
+    if style is None:
+        style = classify_amount(amount_str)
+    return _AMOUNT_PARSERS[style](amount_str)
+
+class AmountParser:
+    """
+    Amount converter for a single file.
+
+    Classifies each value until the first unambiguous one (containing both a
+    comma and a dot), then locks in that style so later rows skip detection.
+    """
+
+    def __init__(self, style: str = None):
+        self.style = style
+
+    def __call__(self, amount_str: str) -> Decimal:
+        if self.style is not None:
+            return parse_amount(amount_str, self.style)
+        cleaned = amount_str.replace('$', '').strip()
+        style = classify_amount(cleaned)
+        if ',' in cleaned and '.' in cleaned:
+            self.style = style
+        return parse_amount(amount_str, style)
+
+    def convert_column(self, values) -> list:
+        """
+        Convert a whole column of amounts, as calling the parser on each cell in order would.
+
+        Cells are classified one by one until the style locks; the rest of the
+        column is then cleaned and parsed with C-level string and Decimal calls.
+        """
+        results = []
+        for n, value in enumerate(values):
+            if self.style is not None:
+                return results + _parse_amount_column(values[n:], self.style)
+            results.append(self(value))
+        return results
+
+def _parse_amount_column(values, style: str) -> list:
+    """
+    Parse a sequence of amount strings of a known style without a Python call per cell.
+    """
+    cleaned = map(str.strip, map(str.replace, values, itertools.repeat('$'), itertools.repeat('')))
+    if style == AMOUNT_EU:
+        cleaned = map(str.replace, map(str.replace, cleaned, itertools.repeat('.'), itertools.repeat('')),
+                      itertools.repeat(','), itertools.repeat('.'))
+    elif style == AMOUNT_US:
+        cleaned = map(str.replace, cleaned, itertools.repeat(','), itertools.repeat(''))
+    try:
+        return list(map(Decimal, cleaned))
+    except (ArithmeticError, TypeError, ValueError):
+        # redo cell by cell to raise the usual error for the offending value
+        return [parse_amount(value, style) for value in values]
+
+# digits after the decimal point of each currency's minor unit (ISO 4217), where it is not 2
+CURRENCY_SCALES = {
+    'BIF': 0, 'CLP': 0, 'DJF': 0, 'GNF': 0, 'ISK': 0, 'JPY': 0, 'KMF': 0, 'KRW': 0, 'PYG': 0,
+    'RWF': 0, 'UGX': 0, 'VND': 0, 'VUV': 0, 'XAF': 0, 'XOF': 0, 'XPF': 0,
+    'BHD': 3, 'IQD': 3, 'JOD': 3, 'KWD': 3, 'LYD': 3, 'OMR': 3, 'TND': 3,
+}
+DEFAULT_CURRENCY_SCALE = 2
+
+def currency_scale(currency: str) -> int:
+    """
+    Return the number of minor-unit digits of a currency code (2 when unknown or missing).
+    """
+    if not currency:
+        return DEFAULT_CURRENCY_SCALE
+    return CURRENCY_SCALES.get(currency.strip().upper(), DEFAULT_CURRENCY_SCALE)
+
+@functools.lru_cache(maxsize=AMOUNT_CACHE_SIZE)
+def parse_minor_units(amount_str: str, scale: int = DEFAULT_CURRENCY_SCALE, style: str = None) -> int:
+    """
+    Parse an amount straight to an int of minor units (cents for scale=2), without building a Decimal.
+
+    Follows the same format rules as parse_amount. Extra fraction digits
+    beyond scale are rounded half to even, as Decimal.quantize would.
+    """
+    cleaned = amount_str.replace('$', '').strip()
+    if style is None:
+        style = classify_amount(cleaned)
+    if style == AMOUNT_EU:
+        number, point = cleaned.replace('.', ''), ','
+    else:
+        number, point = cleaned.replace(',', ''), '.'
+    negative = number[:1] == '-'
+    if number[:1] in ('-', '+'):
+        number = number[1:]
+    whole, _, fraction = number.partition(point)
+    digits = whole + fraction
+    if not digits.isdecimal():
+        raise ValueError(f"Could not convert amount '{amount_str}'")
+    extra = len(fraction) - scale
+    if extra <= 0:
+        units = int(digits) * 10 ** -extra
+    else:
+        units, dropped = int(digits[:-extra] or '0'), fraction[scale:]
+        if dropped > '5' + '0' * (extra - 1) or (dropped[0] == '5' and units % 2):
+            units += 1
+    return -units if negative else units
+
+class MinorUnitParser(AmountParser):
+    """
+    Amount converter for a single file that returns int minor units instead of Decimal.
+
+    Locks in the file's style like AmountParser; the scale is given per value
+    since it depends on the row's currency.
+    """
+
+    def __call__(self, amount_str: str, scale: int = DEFAULT_CURRENCY_SCALE) -> int:
+        if self.style is not None:
+            return parse_minor_units(amount_str, scale, self.style)
+        cleaned = amount_str.replace('$', '').strip()
+        style = classify_amount(cleaned)
+        if ',' in cleaned and '.' in cleaned:
+            self.style = style
+        return parse_minor_units(amount_str, scale, style)
+
+def format_minor_units(units: int, currency: str = None) -> str:
+    """
+    Format an int of minor units as a plain decimal string at the currency's scale, e.g. 123456 -> "1234.56".
+    """
+    scale = currency_scale(currency)
+    sign = '-' if units < 0 else ''
+    digits = str(abs(units)).rjust(scale + 1, '0')
+    if not scale:
+        return sign + digits
+    return f"{sign}{digits[:-scale]}.{digits[-scale:]}"
+
+def minor_units_to_decimal(units: int, currency: str = None) -> Decimal:
+    """
+    Convert an int of minor units back to an exact Decimal, e.g. for output that needs one.
+    """
+    return Decimal(units).scaleb(-currency_scale(currency))
+
+# number of data rows sampled to lock in a file's amount locale
+AMOUNT_SAMPLE_ROWS = 200
+
+def _amount_evidence(amount_str: str):
+    """
+    Return the style a single amount unambiguously points to, or None if it fits both.
+    """
+    amount_str = amount_str.replace('$', '').strip()
+    comma, dot = amount_str.rfind(','), amount_str.rfind('.')
+    if comma >= 0 and dot >= 0:
+        return AMOUNT_EU if comma > dot else AMOUNT_US
+    if comma >= 0:
+        # "1,234,567" groups thousands; "12,34" or "1,5" is a decimal comma; "1,234" fits both
+        if amount_str.count(',') > 1:
+            return AMOUNT_US
+        return None if len(amount_str) - comma == 4 else AMOUNT_EU
+    if dot >= 0:
+        if amount_str.count('.') > 1:
+            return AMOUNT_EU
+        return None if len(amount_str) - dot == 4 else AMOUNT_US
+    return None
+
+def detect_amount_locale(values) -> str:
+    """
+    Decide a single numeric locale (AMOUNT_US or AMOUNT_EU) for a sample of amount strings.
+
+    Only values that unambiguously point to one style vote; returns None when
+    the sample holds no such value.
+    """
+    votes = {AMOUNT_US: 0, AMOUNT_EU: 0}
+    for value in values:
+        style = _amount_evidence(value)
+        if style is not None:
+            votes[style] += 1
+    if votes[AMOUNT_US] == votes[AMOUNT_EU] == 0:
+        return None
+    return AMOUNT_EU if votes[AMOUNT_EU] > votes[AMOUNT_US] else AMOUNT_US
+
+def sniff_delimiter(sample: str) -> str:
     """
     Using csv.Sniffer to detect the delimiter from a file
     """
@@ -61,6 +305,83 @@ def detect_delimiter(sample: str) -> str:
         # Fallback to comma
         return ','
 
+# delimiters considered when detecting (or fingerprinting) a file's dialect
+DELIMITER_CANDIDATES = (',', ';', '|', '\t')
+
+# number of records of the sample used by detect_delimiter
+DELIMITER_SAMPLE_LINES = 20
+
+_DELIMITER_TOKEN = re.compile(r'["\n,;|\t]')
+
+def detect_delimiter(sample: str, max_lines: int = DELIMITER_SAMPLE_LINES) -> str:
+    """
+    Detect the delimiter from the start of a file by counting candidates outside quotes.
+
+    Counts each of DELIMITER_CANDIDATES per record over the first max_lines
+    records (quoted fields, even spanning lines, are skipped) and picks the
+    candidate whose count is the same non-zero number on every record; a
+    delimiter also found inside unquoted values, like the comma of "1,234.56"
+    in a pipe-separated file, is inconsistent and loses. Falls back to comma.
+    """
+    records = []
+    counts = dict.fromkeys(DELIMITER_CANDIDATES, 0)
+    in_quotes = False
+    for match in _DELIMITER_TOKEN.finditer(sample):
+        token = match.group()
+        if token == '"':
+            in_quotes = not in_quotes
+        elif in_quotes:
+            continue
+        elif token == '\n':
+            if any(counts.values()):
+                records.append(counts)
+                if len(records) == max_lines:
+                    break
+            counts = dict.fromkeys(DELIMITER_CANDIDATES, 0)
+        else:
+            counts[token] += 1
+    # the sample may cut the last record short; only use it when nothing else is available
+    if not records and any(counts.values()):
+        records.append(counts)
+    if not records:
+        return ','
+
+    def score(delimiter):
+        per_record = [record[delimiter] for record in records]
+        mode = max(set(per_record), key=per_record.count)
+        consistent = min(per_record) > 0 and mode == max(per_record) == min(per_record)
+        return (consistent, min(per_record) > 0, per_record.count(mode) if mode else 0, mode)
+
+    return max(DELIMITER_CANDIDATES, key=score)
+
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_CURRENCY_PATTERN = re.compile(r'^[A-Za-z]{3}$')
+_STATUS_VALUES = {"completed", "pending", "failed", "cancelled"}
+
+def _is_date(val: str) -> bool:
+    return bool(_DATE_PATTERN.match(val.strip()))
+
+def _is_currency(val: str) -> bool:
+    return bool(_CURRENCY_PATTERN.match(val.strip()))
+
+def _is_status(val: str) -> bool:
+    return val.strip().lower() in _STATUS_VALUES
+
+def _is_amount(val: str) -> bool:
+    try:
+        _ = parse_amount(val)
+        return True
+    except Exception:
+        return False
+
+# typed columns recognised by content, in the order they win ties
+_COLUMN_CHECKS = (
+    ('transaction_date', _is_date),
+    ('currency', _is_currency),
+    ('status', _is_status),
+    ('amount', _is_amount),
+)
+
 def infer_column_mapping(row: list) -> dict:
     """
     dynamically infer the mapping from column index to expected column names, based on analyzing the content
@@ -74,24 +395,7 @@ def infer_column_mapping(row: list) -> dict:
     """
     mapping = {}
     used = set()
-    
-    # Helper checks:
-    def is_date(val):
-        return bool(re.match(r'^\d{4}-\d{2}-\d{2}$', val.strip()))
-    
-    def is_currency(val):
-        val = val.strip()
-        return bool(re.match(r'^[A-Za-z]{3}$', val))
-    
-    def is_status(val):
-        return val.strip().lower() in {"completed", "pending", "failed", "cancelled"}
-    
-    def is_amount(val):
-        try:
-            _ = convert_amount(val)
-            return True
-        except Exception:
-            return False
+    is_date, is_currency, is_status, is_amount = _is_date, _is_currency, _is_status, _is_amount
 
     # First pass: check for clear patterns (date, currency, status)
     for i, value in enumerate(row):
@@ -132,6 +436,117 @@ def infer_column_mapping(row: list) -> dict:
     
     return mapping
 
+def infer_column_mapping_sampled(rows: list) -> tuple:
+    """
+    Infer the column mapping of a headerless file from a sample of rows.
+
+    Every column is scored against each typed field (date, currency, status,
+    amount) as the fraction of sampled rows whose value matches it, so a single
+    odd row cannot misclassify the file. Fields are assigned greedily from the
+    highest score down; the remaining column that looks least like any typed
+    field becomes the description and any others are marked unknown.
+
+    Returns:
+      The mapping from column index to column name, and its confidence: the
+      lowest match fraction among the typed fields (1.0 means every sampled
+      row agreed with the mapping).
+    """
+    width = len(rows[0])
+    rows = [row for row in rows if len(row) == width]
+    scores = {}
+    for i in range(width):
+        values = [row[i] for row in rows]
+        for field, check in _COLUMN_CHECKS:
+            scores[i, field] = sum(1 for value in values if check(value)) / len(values)
+
+    priority = {field: rank for rank, (field, _) in enumerate(_COLUMN_CHECKS)}
+    candidates = sorted(scores.items(), key=lambda item: (-item[1], priority[item[0][1]], item[0][0]))
+    mapping = {}
+    confidence = {}
+    for (i, field), score in candidates:
+        if score > 0 and i not in mapping and field not in confidence:
+            mapping[i] = field
+            confidence[field] = score
+
+    remaining = [i for i in range(width) if i not in mapping]
+    if remaining:
+        description = min(remaining, key=lambda i: (max(scores[i, field] for field in priority), i))
+        for i in remaining:
+            mapping[i] = 'description' if i == description else 'unknown'
+
+    # Verify that all required columns are found.
+    required = {'transaction_date', 'description', 'amount', 'currency', 'status'}
+    missing = required - set(mapping.values())
+    if missing:
+        raise ValueError("Could not infer columns for: " + ", ".join(missing))
+
+    return mapping, min(confidence.values())
+
+def detect_header(row: list) -> bool:
+    """
+    Guess whether the first row of a file is a header.
+
+    A data row always carries enough recognisable values (date, amount,
+    currency, status) for the column mapping to be inferred; a header does not.
+    """
+    try:
+        infer_column_mapping(row)
+    except ValueError:
+        return True
+    return False
+
+# number of distinct date strings memoized by convert_date
+DATE_CACHE_SIZE = 4096
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def convert_date(value: str) -> datetime:
+    """
+    Convert a date string to a datetime, trying YYYY-MM-DD first and ISO format second.
+
+    Zero-padded YYYY-MM-DD values are sliced directly instead of going through
+    strptime, and results are memoized since exports repeat the same dates.
+    """
+    if (len(value) == 10 and value[4] == '-' and value[7] == '-'
+            and value[:4].isdecimal() and value[5:7].isdecimal() and value[8:].isdecimal()):
+        try:
+            return datetime(int(value[:4]), int(value[5:7]), int(value[8:]))
+        except ValueError:
+            pass
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+def cache_stats() -> dict:
+    """
+    Report hit rates of the date and amount caches since they were last cleared.
+    """
+    stats = {}
+    for name, func in (("date", convert_date), ("amount", parse_amount)):
+        info = func.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+        }
+    return stats
+
+# converters applied to a single cell, keyed by normalized column name.
+# columns not listed here are treated as free text and only trimmed.
+COLUMN_CONVERTERS = {
+    "transaction_date": lambda value: convert_date(value.strip()),
+    "amount": parse_amount,
+    "status": lambda value: value.strip().lower(),
+}
+
+def column_converter(key: str):
+    """
+    Return the function used to normalize a single cell of the given column.
+    """
+    return COLUMN_CONVERTERS.get(key, str.strip)
+
 def normalize_row(row_dict: dict) -> dict:
     """
     Normalize a row dictionary using the defined rules:
@@ -142,62 +557,1599 @@ def normalize_row(row_dict: dict) -> dict:
     """
     normalized = {}
     for key, value in row_dict.items():
-        value = value.strip()
-        if key == "transaction_date":
-            try:
-                normalized[key] = datetime.strptime(value, '%Y-%m-%d')
-            except ValueError:
-                normalized[key] = datetime.fromisoformat(value)
-        elif key == "amount":
-            normalized[key] = convert_amount(value)
-        elif key == "status":
-            normalized[key] = value.lower()
-        else:
-            normalized[key] = value
+        normalized[key] = column_converter(key)(value)
     return normalized
 
-def process_csv(file_path: str, has_header: bool = True, column_mapping: dict = None) -> list:
+# fields of the target schema, in output order
+TRANSACTION_FIELDS = ('transaction_date', 'description', 'amount', 'currency', 'status')
+
+class Transaction:
+    """
+    Compact normalized row holding only the five schema fields.
+
+    Uses __slots__ instead of a per-instance dict, which makes it several times
+    smaller than a row dictionary when millions of rows are held in memory.
+    """
+    __slots__ = TRANSACTION_FIELDS
+
+    def __init__(self, transaction_date=None, description=None, amount=None, currency=None, status=None):
+        self.transaction_date = transaction_date
+        self.description = description
+        self.amount = amount
+        self.currency = currency
+        self.status = status
+
+    @classmethod
+    def from_dict(cls, row: dict) -> "Transaction":
+        """
+        Build a Transaction from a normalized row dictionary; other columns are dropped.
+        """
+        return cls(*[row.get(field) for field in TRANSACTION_FIELDS])
+
+    def to_dict(self) -> dict:
+        """
+        Convert back to a normalized row dictionary.
+        """
+        return {field: getattr(self, field) for field in TRANSACTION_FIELDS}
+
+    def __eq__(self, other):
+        if not isinstance(other, Transaction):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in TRANSACTION_FIELDS)
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in TRANSACTION_FIELDS)
+        return f"Transaction({fields})"
+
+def transactions_to_dicts(rows) -> list:
+    """
+    Convert a list of Transaction records to row dictionaries for callers expecting dicts.
+    """
+    return [row.to_dict() for row in rows]
+
+# low-cardinality columns interned through a per-file SymbolTable
+SYMBOL_COLUMNS = ("currency", "status")
+
+# a dictionary-encoded column: integer codes into a list of distinct values
+DictionaryColumn = collections.namedtuple("DictionaryColumn", ["codes", "values"])
+
+class SymbolTable:
+    """
+    Per-file table interning the values of a low-cardinality column.
+
+    Each distinct raw cell is normalized once; every row then shares the same
+    string object, and each distinct value gets a small integer code.
+    """
+
+    def __init__(self, convert):
+        self.convert = convert
+        self.raw_codes = {}
+        self.codes = {}
+        self.values = []
+
+    def encode(self, raw: str) -> int:
+        """
+        Return the integer code of a raw cell, adding its normalized value if new.
+        """
+        code = self.raw_codes.get(raw)
+        if code is None:
+            value = self.convert(raw)
+            code = self.codes.get(value)
+            if code is None:
+                code = len(self.values)
+                self.codes[value] = code
+                self.values.append(value)
+            self.raw_codes[raw] = code
+        return code
+
+    def __call__(self, raw: str) -> str:
+        return self.values[self.encode(raw)]
+
+class ColumnPlan:
+    """
+    Per-file conversion plan: one converter per column position, resolved once from the headers.
+
+    Applying the plan to a raw row list avoids building an intermediate dict
+    and re-checking column names for every cell. Currency and status values
+    are interned through a SymbolTable per column. With minor_units=True,
+    amounts become ints of minor units at the scale of the row's currency.
+    """
+
+    def __init__(self, headers: list, overrides: dict = None, minor_units: bool = False):
+        overrides = dict(overrides or {})
+        if minor_units:
+            for i, header in enumerate(headers):
+                if header == "amount":
+                    overrides[i] = MinorUnitParser(getattr(overrides.get(i), 'style', None))
+        self.headers = tuple(headers)
+        self.converters = tuple(overrides.get(i) or self._default_converter(header)
+                                for i, header in enumerate(headers))
+        # amounts are parsed at the default scale first and redone for currencies with another one
+        self.minor_amounts = tuple((i, header, convert) for i, (header, convert)
+                                   in enumerate(zip(self.headers, self.converters))
+                                   if isinstance(convert, MinorUnitParser))
+        self.currency_index = self.headers.index("currency") if "currency" in self.headers else None
+
+    @staticmethod
+    def _default_converter(header: str):
+        if header in SYMBOL_COLUMNS:
+            return SymbolTable(column_converter(header))
+        return column_converter(header)
+
+    def apply(self, row: list) -> dict:
+        """
+        Normalize a raw row list into a row dictionary.
+        """
+        result = {key: convert(value) for key, convert, value in zip(self.headers, self.converters, row)}
+        if self.minor_amounts and self.currency_index is not None:
+            scale = currency_scale(row[self.currency_index])
+            if scale != DEFAULT_CURRENCY_SCALE:
+                for i, key, convert in self.minor_amounts:
+                    result[key] = convert(row[i], scale)
+        return result
+
+    def apply_columns(self, columns: list, encode_symbols: bool = False) -> dict:
+        """
+        Normalize a list of raw columns into a dict of column name -> list of values.
+
+        With encode_symbols=True, interned columns become DictionaryColumn codes instead.
+        """
+        batch = {}
+        rescaled = self.minor_amounts and self.currency_index is not None
+        for key, convert, values in zip(self.headers, self.converters, columns):
+            if rescaled and isinstance(convert, MinorUnitParser):
+                # filled in below at each row's scale; converting twice would lock the style early
+                batch[key] = None
+            elif encode_symbols and isinstance(convert, SymbolTable):
+                batch[key] = DictionaryColumn(_map_distinct(convert.encode, values), tuple(convert.values))
+            elif type(convert) is AmountParser:
+                batch[key] = convert.convert_column(values)
+            elif convert is str.strip:
+                # free-text columns are mostly distinct, and str.strip is already a C call
+                batch[key] = list(map(convert, values))
+            else:
+                batch[key] = _map_distinct(convert, values)
+        if rescaled:
+            scales = _map_distinct(currency_scale, columns[self.currency_index])
+            for i, key, convert in self.minor_amounts:
+                batch[key] = _map_distinct(convert, columns[i], scales)
+        return batch
+
+def _map_distinct(convert, *columns) -> list:
+    """
+    Apply convert once per distinct cell (or tuple of cells across columns) and map the results back.
+
+    Distinct cells are converted in order of first appearance, so converters
+    that lock in a style (AmountParser) see the same sequence as the row path.
+    """
+    if isinstance(convert, AmountParser) and convert.style is None:
+        # a value seen before the style locks may parse differently after it, so go cell by cell until then
+        results = []
+        for n, cells in enumerate(zip(*columns)):
+            if convert.style is not None:
+                return results + _map_distinct(convert, *(column[n:] for column in columns))
+            results.append(convert(*cells))
+        return results
+    values = columns[0] if len(columns) == 1 else list(zip(*columns))
+    if len(columns) == 1:
+        results = {value: convert(value) for value in dict.fromkeys(values)}
+    else:
+        results = {value: convert(*value) for value in dict.fromkeys(values)}
+    return list(map(results.__getitem__, values))
+
+def _amount_overrides(sample_rows: list, headers: list, amount_locale: str) -> dict:
+    """
+    Build the amount converter for each amount column position.
+
+    With amount_locale='auto' the locale is detected from the sampled rows,
+    separately for every amount column; 'us' or 'eu' declare it for all of
+    them, and None keeps the per-cell rules of convert_amount.
+    """
+    if amount_locale is None:
+        return {}
+    overrides = {}
+    for i, header in enumerate(headers):
+        if header != "amount":
+            continue
+        if amount_locale == 'auto':
+            values = [row[i] for row in sample_rows if len(row) == len(headers)]
+            overrides[i] = AmountParser(detect_amount_locale(values))
+        elif amount_locale in (AMOUNT_US, AMOUNT_EU):
+            overrides[i] = AmountParser(amount_locale)
+        else:
+            raise ValueError(f"Unknown amount locale '{amount_locale}'")
+    return overrides
+
+# number of rows sampled to infer the column mapping of a headerless file
+INFERENCE_SAMPLE_ROWS = 50
+
+# leading bytes identifying compressed inputs
+_COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+
+# file name suffixes picked up when expanding directories
+CSV_SUFFIXES = ('.csv', '.csv.gz', '.csv.bz2', '.csv.xz', '.csv.zst')
+
+def detect_compression(head: bytes) -> str:
+    """
+    Return the compression format ('gzip', 'bz2', 'xz' or 'zstd') of a file from its first bytes, or None.
+    """
+    for magic, name in _COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+def _decompressor(raw, compression: str):
+    """
+    Wrap a binary stream in a streaming decompressor. Closing it leaves raw open.
+    """
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if compression == 'bz2':
+        return bz2.BZ2File(raw)
+    if compression == 'xz':
+        return lzma.LZMAFile(raw)
+    try:
+        from compression import zstd
+        return zstd.ZstdFile(raw)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd-compressed input requires zstandard: pip install zstandard") from None
+    return zstandard.ZstdDecompressor().stream_reader(raw, closefd=False)
+
+# bytes of the start of a file inspected by detect_encoding
+ENCODING_SAMPLE_SIZE = 4096
+
+# bytes cp1252 leaves undefined; a non-utf-8 file containing them is read as latin-1
+_CP1252_UNDEFINED = re.compile(rb'[\x81\x8d\x8f\x90\x9d]')
+
+# cp1252, with the bytes it leaves undefined read as latin-1 instead of failing
+CP1252_LENIENT = 'cp1252-lenient'
+# strict utf-8 that switches to CP1252_LENIENT for good at the first invalid byte
+UTF8_OR_CP1252 = 'utf-8-or-cp1252'
+
+_CP1252_LENIENT_TABLE = ''.join(bytes([i]).decode('cp1252', errors='ignore') or chr(i) for i in range(256))
+
+def _decode_cp1252_lenient(data, errors: str = 'strict') -> tuple:
+    return codecs.charmap_decode(data, errors, _CP1252_LENIENT_TABLE)
+
+class _Utf8OrCp1252Decoder(codecs.IncrementalDecoder):
+    """
+    Incremental decoder for UTF8_OR_CP1252.
+
+    Decodes utf-8 until the first byte sequence that is not valid utf-8, then
+    decodes that byte and everything after it as CP1252_LENIENT. A multi-byte
+    character split between two reads is carried over to the next one.
+    """
+
+    def __init__(self, errors: str = 'strict'):
+        super().__init__(errors)
+        self.pending = b''
+        self.fallback = False
+
+    def decode(self, data, final: bool = False) -> str:
+        data = self.pending + bytes(data)
+        self.pending = b''
+        if self.fallback:
+            return _decode_cp1252_lenient(data)[0]
+        try:
+            text, consumed = codecs.utf_8_decode(data, 'strict', final)
+        except UnicodeDecodeError as e:
+            self.fallback = True
+            return data[:e.start].decode('utf-8') + _decode_cp1252_lenient(data[e.start:])[0]
+        self.pending = data[consumed:]
+        return text
+
+    def reset(self):
+        self.pending = b''
+        self.fallback = False
+
+    def getstate(self):
+        return self.pending, int(self.fallback)
+
+    def setstate(self, state):
+        self.pending, fallback = state
+        self.fallback = bool(fallback)
+
+def _decode_utf8_or_cp1252(data, errors: str = 'strict') -> tuple:
+    return _Utf8OrCp1252Decoder(errors).decode(data, final=True), len(data)
+
+class _Cp1252LenientDecoder(codecs.IncrementalDecoder):
+    def decode(self, data, final: bool = False) -> str:
+        return _decode_cp1252_lenient(data)[0]
+
+def _search_codec(name: str):
+    # codecs.lookup hands over the name lower-cased, with hyphens possibly turned into underscores
+    name = name.replace('_', '-')
+    if name == UTF8_OR_CP1252:
+        return codecs.CodecInfo(codecs.utf_8_encode, _decode_utf8_or_cp1252, name=UTF8_OR_CP1252,
+                                incrementalencoder=codecs.getincrementalencoder('utf-8'),
+                                incrementaldecoder=_Utf8OrCp1252Decoder)
+    if name == CP1252_LENIENT:
+        cp1252 = codecs.lookup('cp1252')
+        return codecs.CodecInfo(cp1252.encode, _decode_cp1252_lenient, name=CP1252_LENIENT,
+                                incrementalencoder=cp1252.incrementalencoder,
+                                incrementaldecoder=_Cp1252LenientDecoder)
+    return None
+
+codecs.register(_search_codec)
+
+# encodings detected per source file (absolute path and modification time)
+_ENCODING_CACHE = {}
+
+def _feed_name(source: str) -> str:
+    """
+    Return the feed a file belongs to: its file name with digits stripped, so daily exports share it.
+    """
+    return re.sub(r'\d+', '', os.path.basename(source))
+
+def _encoding_cache_key(source: str):
+    try:
+        return os.path.abspath(source), os.stat(source).st_mtime_ns
+    except (OSError, TypeError, ValueError):
+        return None
+
+def detect_encoding(sample: bytes, source: str = None) -> str:
+    """
+    Detect the text encoding of a file from its first bytes.
+
+    A BOM decides directly. A sample that is not valid utf-8 means cp1252
+    (CP1252_LENIENT), or latin-1 when it holds bytes cp1252 leaves undefined.
+    A valid sample, pure ASCII or not, does not prove the rest of the file is
+    utf-8, so it gives UTF8_OR_CP1252: strict utf-8 that switches to cp1252
+    at the first invalid byte while the file is read, instead of failing or
+    producing mojibake. Results are cached per source file.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    key = _encoding_cache_key(source) if source else None
+    if key in _ENCODING_CACHE:
+        return _ENCODING_CACHE[key]
+    try:
+        # the sample may end in the middle of a multi-byte character
+        codecs.utf_8_decode(sample, 'strict', False)
+        encoding = UTF8_OR_CP1252
+    except UnicodeDecodeError:
+        encoding = 'latin-1' if _CP1252_UNDEFINED.search(sample) else CP1252_LENIENT
+    if key is not None:
+        _ENCODING_CACHE[key] = encoding
+    return encoding
+
+def _source_name(source) -> str:
+    """
+    Return the file name of a path or file-like source, or '' when it has none.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    name = getattr(source, 'name', '')
+    return name if isinstance(name, str) else ''
+
+class _ReadOnlyStream(io.RawIOBase):
+    """
+    Raw stream over a binary object that only has read(), so it can be buffered.
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.source.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+@contextlib.contextmanager
+def open_source(source, encoding: str = None):
+    """
+    Open a path or file-like object as a text stream for the CSV reader.
+
+    Binary inputs compressed with gzip, bz2, xz or zstd (recognised by their
+    leading bytes) are decompressed on the fly while reading. Unless given,
+    the encoding is detected from the first decompressed bytes and the text is
+    then decoded incrementally as it is read. Text streams are used as they
+    are. Binary objects need only a read(size) method. File objects passed in
+    are left open.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        raw = open(source, 'rb')
+        owned = True
+    elif isinstance(source.read(0), str):
+        yield source
+        return
+    else:
+        raw = source
+        owned = False
+
+    if hasattr(raw, 'peek'):
+        buffered = raw
+    elif hasattr(raw, 'readinto') and hasattr(raw, 'readable'):
+        buffered = io.BufferedReader(raw)
+    else:
+        buffered = io.BufferedReader(_ReadOnlyStream(raw))
+    decompressed = text = None
+    try:
+        compression = detect_compression(buffered.peek(6)[:6])
+        decompressed = _decompressor(buffered, compression) if compression else None
+        stream = decompressed or buffered
+        if not hasattr(stream, 'peek'):
+            stream = io.BufferedReader(stream)
+        if encoding is None:
+            encoding = detect_encoding(stream.peek(ENCODING_SAMPLE_SIZE)[:ENCODING_SAMPLE_SIZE],
+                                       _source_name(source))
+        text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+        yield text
+    finally:
+        if text is not None:
+            text.detach()
+        if decompressed is not None:
+            decompressed.close()
+        if owned:
+            raw.close()
+        elif buffered is not raw:
+            buffered.detach()
+
+def _write_json_atomic(path: str, data):
+    """
+    Write data as JSON so that readers never see a half-written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+_NUMBER_PATTERN = re.compile(r'^\s*[$+-]*\s*[\d.,]*\d[\d.,]*\s*$')
+
+# per-cell classes used to fingerprint a first line (see SchemaCache.fingerprint)
+_SHAPE_CHECKS = (
+    ('transaction_date', _is_date),
+    ('currency', _is_currency),
+    ('status', _is_status),
+    ('amount', lambda val: bool(_NUMBER_PATTERN.match(val))),
+)
+
+class SchemaCache:
+    """
+    Persistent on-disk cache of detected file layouts, for recurring feeds.
+
+    A file's shape is fingerprinted from its source name (file name without
+    digits, so daily exports share it) and its first line: the exact cells
+    when they are all plain text (a header), otherwise the pattern class of
+    each cell (date, currency, status, number or text). Only cheap pattern
+    checks run, never header detection or inference. A hit restores the delimiter, header flag and normalized headers or
+    column mapping without running detection or inference again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def fingerprint(first_line: str, source: str) -> str:
+        """
+        Return the cache key of a file from its first line and source name.
+        """
+        line = first_line.rstrip('\r\n')
+        delimiter = max(DELIMITER_CANDIDATES, key=line.count)
+        cells = next(csv.reader([line], delimiter=delimiter), [])
+        # cheap pattern checks only, so a hit costs no header detection or column inference:
+        # a line of plain text cells is a header and keyed by its exact cells
+        shape = [next((field for field, check in _SHAPE_CHECKS if check(cell)), 'text') for cell in cells]
+        if all(kind == 'text' for kind in shape):
+            shape = cells
+        key = json.dumps([_feed_name(source), delimiter, len(cells), shape])
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> dict:
+        return self.entries.get(key)
+
+    def put(self, key: str, layout: dict):
+        """
+        Store a layout and save the cache, merging entries written by other processes meanwhile.
+        """
+        self.entries = {**self._load(), **self.entries, key: layout}
+        _write_json_atomic(self.path, self.entries)
+
+def _open_csv(f, has_header: bool, column_mapping: dict, amount_locale: str = 'auto',
+              schema_cache: SchemaCache = None, source_name: str = None, minor_units: bool = False):
+    """
+    Detect the delimiter, resolve the headers and build the conversion plan of an open CSV file.
+
+    Returns a row iterator, the ColumnPlan and the detected layout: a dict with
+    the delimiter, whether the file has a header, the resolved headers and the
+    confidence of an inferred column mapping (None when it was not inferred).
+    Rows consumed while inferring the mapping or sampling amounts are put back
+    in front of the iterator. With a schema_cache, a known file shape reuses
+    its cached layout and skips detection entirely.
+
+    The stream is only read forwards, so it does not need to be seekable.
+    """
+    # read the start of the file once (ending on a full line) and put it back in front
+    head = f.read(1024)
+    head += f.readline()
+    if not head:
+        name = source_name or _source_name(f)
+        raise ValueError(f"Empty CSV file: {name}" if name else "Empty CSV file")
+    lines = itertools.chain(io.StringIO(head, newline=''), f)
+
+    key = cached = None
+    if schema_cache is not None and column_mapping is None:
+        if source_name is None:
+            source_name = getattr(f, 'name', '')
+        first_line = next(io.StringIO(head, newline=''), '')
+        key = schema_cache.fingerprint(first_line, str(source_name))
+        cached = schema_cache.get(key)
+        if cached is not None and has_header is not None and has_header != cached["has_header"]:
+            cached = None
+
+    if cached is not None:
+        layout = cached
+        reader = csv.reader(lines, delimiter=layout["delimiter"])
+        if layout["has_header"]:
+            next(reader)
+    else:
+        reader, layout = _detect_layout(head, lines, has_header, column_mapping)
+        if key is not None:
+            schema_cache.put(key, layout)
+
+    headers = layout["headers"]
+    sample_rows = list(itertools.islice(reader, AMOUNT_SAMPLE_ROWS))
+    plan = ColumnPlan(headers, _amount_overrides(sample_rows, headers, amount_locale), minor_units)
+    return itertools.chain(sample_rows, reader), plan, layout
+
+def _detect_layout(sample: str, lines, has_header: bool, column_mapping: dict):
+    """
+    Sniff the delimiter from a sample of the file and resolve the headers.
+
+    Returns a row iterator over lines positioned at the first data row, and the layout dict.
+    """
+    delimiter = detect_delimiter(sample)
+    reader = csv.reader(lines, delimiter=delimiter)
+
+    if has_header is None:
+        first_row = next(reader)
+        has_header = detect_header(first_row)
+        reader = itertools.chain([first_row], reader)
+
+    confidence = None
+    if has_header:
+        headers = normalize_headers(tuple(next(reader)))
+    else:
+        # Sample the first rows and infer column mapping if not provided.
+        first_row = next(reader)
+        sample_rows = [first_row] + list(itertools.islice(reader, INFERENCE_SAMPLE_ROWS - 1))
+        if column_mapping is None:
+            mapping, confidence = infer_column_mapping_sampled(sample_rows)
+        else:
+            mapping = column_mapping
+        # Create headers preserving original order.
+        headers = [mapping[i] for i in range(len(first_row))]
+        reader = itertools.chain(sample_rows, reader)
+
+    layout = {"delimiter": delimiter, "has_header": has_header, "headers": list(headers),
+              "confidence": confidence}
+    return reader, layout
+
+def sniff_csv(file_path: str, has_header: bool = True, column_mapping: dict = None,
+              schema_cache: SchemaCache = None, encoding: str = None) -> dict:
+    """
+    Detect a file's layout without normalizing it.
+
+    Returns:
+      The layout dict: delimiter, has_header, headers and, for headerless
+      files whose mapping was inferred, the confidence of that mapping, so
+      callers can reject a bad guess before processing a large file.
+    """
+    with open_source(file_path, encoding) as f:
+        _, _, layout = _open_csv(f, has_header, column_mapping, amount_locale=None,
+                                 schema_cache=schema_cache, source_name=_source_name(file_path))
+    return layout
+
+def _iter_records(reader, headers: tuple):
+    """
+    Yield raw rows that match the header width, skipping empty and mismatched rows.
+    """
+    for row in reader:
+        if not row:  # Skip empty rows
+            continue
+        if len(row) != len(headers):
+            print(f"Warning: Mismatched number of columns in row: {row}", file=sys.stderr)
+            continue
+        yield row
+
+def iter_csv(file_path: str, has_header: bool = True, column_mapping: dict = None,
+             amount_locale: str = 'auto', schema_cache: SchemaCache = None, encoding: str = None,
+             minor_units: bool = False):
+    """
+    Stream normalized rows from a CSV file one at a time.
+
+    Same rules as process_csv, but rows are yielded as they are read so memory
+    use stays constant regardless of file size.
+    """
+    with open_source(file_path, encoding) as f:
+        reader, plan, _ = _open_csv(f, has_header, column_mapping, amount_locale, schema_cache,
+                                    _source_name(file_path), minor_units)
+        for row in _iter_records(reader, plan.headers):
+            yield plan.apply(row)
+
+def iter_batches(file_path: str, has_header: bool = True, column_mapping: dict = None,
+                 batch_size: int = 10000, amount_locale: str = 'auto', encode_symbols: bool = False,
+                 schema_cache: SchemaCache = None, encoding: str = None, minor_units: bool = False):
+    """
+    Stream normalized data from a CSV file as column batches.
+
+    Reads up to batch_size rows at a time, transposes them into per-column
+    lists and applies one converter per column, skipping the per-row dicts.
+
+    Yields:
+      dicts mapping each column name to a list of normalized values. With
+      encode_symbols=True, currency and status are DictionaryColumn codes
+      into the values seen so far in the file.
+    """
+    with open_source(file_path, encoding) as f:
+        reader, plan, _ = _open_csv(f, has_header, column_mapping, amount_locale, schema_cache,
+                                    _source_name(file_path), minor_units)
+        records = _iter_records(reader, plan.headers)
+        while True:
+            rows = list(itertools.islice(records, batch_size))
+            if not rows:
+                break
+            yield plan.apply_columns(list(zip(*rows)), encode_symbols)
+
+# target size in bytes of each chunk handed to a worker in parallel mode
+PARALLEL_CHUNK_SIZE = 16 * 1024 * 1024
+
+_RECORD_TOKEN = re.compile(rb'["\n]')
+
+def _next_record_start(f, offset: int, in_quotes: bool = False) -> int:
+    """
+    Return the byte offset of the first record starting at or after offset.
+
+    Scans forward for a newline outside quoted fields, so quoted values with
+    embedded newlines are never split. in_quotes gives the quoting state at offset.
+    """
+    f.seek(offset)
+    while True:
+        block = f.read(64 * 1024)
+        if not block:
+            return f.tell()
+        for match in _RECORD_TOKEN.finditer(block):
+            if match.group() == b'"':
+                in_quotes = not in_quotes
+            elif not in_quotes:
+                return offset + match.end()
+        offset += len(block)
+
+def _chunk_boundaries(file_path: str, start: int, chunk_size: int) -> list:
+    """
+    Split the bytes from start to the end of the file into record-aligned ranges of about chunk_size.
+
+    The quoting state at each tentative split point is tracked by counting
+    quote characters from start, so the split is safe even inside multi-line fields.
+    """
+    size = os.path.getsize(file_path)
+    boundaries = [start]
+    with open(file_path, 'rb') as f:
+        pos, quotes = start, 0
+        while boundaries[-1] + chunk_size < size:
+            target = boundaries[-1] + chunk_size
+            f.seek(pos)
+            quotes += f.read(target - pos).count(b'"')
+            boundary = _next_record_start(f, target, in_quotes=quotes % 2 == 1)
+            if boundary >= size:
+                break
+            # count the quotes skipped while looking for the record start
+            f.seek(target)
+            quotes += f.read(boundary - target).count(b'"')
+            pos = boundary
+            boundaries.append(boundary)
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+# bytes of the memory map decoded at a time by _iter_mmap_rows
+MMAP_BLOCK_SIZE = 1024 * 1024
+
+def _record_end(buf, pos: int, in_quotes: bool = False) -> int:
+    """
+    Return the offset just past the first newline outside quoted fields at or after pos
+    in a bytes-like buffer. in_quotes gives the quoting state at pos.
+    """
+    for match in _RECORD_TOKEN.finditer(buf, pos):
+        if match.group() == b'"':
+            in_quotes = not in_quotes
+        elif not in_quotes:
+            return match.end()
+    return len(buf)
+
+def _iter_mmap_blocks(buf, start: int, end: int, encoding: str = 'utf-8', block_size: int = MMAP_BLOCK_SIZE):
+    """
+    Cut buf[start:end], a memory-mapped file, into record-aligned blocks of about block_size bytes.
+
+    Yields:
+      (offset just past the block, decoded text of the block)
+    """
+    pos = start
+    while pos < end:
+        block_end = min(pos + block_size, end)
+        if block_end < end:
+            newline = buf.rfind(b'\n', pos, block_end)
+            if newline < 0:
+                block_end = min(_record_end(buf, pos), end)
+            else:
+                # the block ends on a record boundary only if its quotes are balanced
+                in_quotes = buf[pos:newline].count(b'"') % 2 == 1
+                block_end = min(_record_end(buf, newline, in_quotes), end)
+        yield block_end, buf[pos:block_end].decode(encoding)
+        pos = block_end
+
+def _split_block(text: str, delimiter: str):
+    """
+    Yield the raw rows of a block of complete records.
+
+    Plain lines are split directly; blocks containing quotes or carriage
+    returns are handed to csv.reader.
+    """
+    if '"' in text or '\r' in text:
+        yield from csv.reader(io.StringIO(text, newline=''), delimiter=delimiter)
+        return
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    for line in lines:
+        yield line.split(delimiter) if line else []
+
+def _iter_mmap_rows(buf, start: int, end: int, delimiter: str, encoding: str = 'utf-8'):
+    """
+    Yield the raw rows of buf[start:end], a memory-mapped file, without going through the io layer.
+    """
+    for _, text in _iter_mmap_blocks(buf, start, end, encoding):
+        yield from _split_block(text, delimiter)
+
+def _plain_file_encoding(file_path, encoding: str = None) -> str:
+    """
+    Check that file_path is a path to an uncompressed file, which byte-level readers need,
+    and return its encoding (detected unless given).
+    """
+    if not isinstance(file_path, (str, os.PathLike)):
+        raise ValueError("Memory-mapped and parallel reading need a file path, not a stream")
+    with open(file_path, 'rb') as f:
+        head = f.read(ENCODING_SAMPLE_SIZE)
+    if detect_compression(head):
+        raise ValueError(f"Memory-mapped and parallel reading need an uncompressed file: {file_path}")
+    encoding = encoding or detect_encoding(head, _source_name(file_path))
+    if codecs.lookup(encoding).name.startswith('utf-16'):
+        raise ValueError(f"Memory-mapped and parallel reading need an ASCII-compatible encoding, not {encoding}")
+    return encoding
+
+def _data_start(file_path: str, layout: dict) -> int:
+    """
+    Return the byte offset of the first data record of a file.
+    """
+    if not layout["has_header"]:
+        return 0
+    with open(file_path, 'rb') as f:
+        return _next_record_start(f, 0)
+
+def iter_csv_mmap(file_path: str, has_header: bool = True, column_mapping: dict = None,
+                  amount_locale: str = 'auto', schema_cache: SchemaCache = None, encoding: str = None,
+                  minor_units: bool = False):
+    """
+    Stream normalized rows from a memory-mapped CSV file.
+
+    Only the start of the file is read through the text layer to detect the
+    delimiter and headers; the data itself is scanned as raw bytes straight
+    from the page cache, which concurrent readers of the same file share.
+    """
+    encoding = _plain_file_encoding(file_path, encoding)
+    with open_source(file_path, encoding) as f:
+        _, plan, layout = _open_csv(f, has_header, column_mapping, amount_locale, schema_cache,
+                                    minor_units=minor_units)
+    start = _data_start(file_path, layout)
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            rows = _iter_mmap_rows(buf, start, len(buf), layout["delimiter"], encoding)
+            for row in _iter_records(rows, plan.headers):
+                yield plan.apply(row)
+
+def _process_chunk(file_path: str, start: int, end: int, delimiter: str,
+                   headers: tuple, amount_styles: dict, encoding: str, minor_units: bool = False) -> list:
+    """
+    Normalize the records in one byte range of a file. Runs in a worker process.
+    """
+    plan = ColumnPlan(headers, {i: AmountParser(style) for i, style in amount_styles.items()}, minor_units)
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            rows = _iter_mmap_rows(buf, start, end, delimiter, encoding)
+            return [plan.apply(row) for row in _iter_records(rows, plan.headers)]
+
+def iter_csv_parallel(file_path: str, has_header: bool = True, column_mapping: dict = None,
+                      amount_locale: str = 'auto', workers: int = None,
+                      chunk_size: int = PARALLEL_CHUNK_SIZE, schema_cache: SchemaCache = None,
+                      encoding: str = None, minor_units: bool = False):
+    """
+    Normalize a large CSV file across a pool of worker processes.
+
+    The delimiter, headers and amount locale are resolved once here; the data
+    is then split into record-aligned byte ranges that workers normalize
+    independently from a shared memory map. Rows are yielded in file order.
+    """
+    encoding = _plain_file_encoding(file_path, encoding)
+    with open_source(file_path, encoding) as f:
+        _, plan, layout = _open_csv(f, has_header, column_mapping, amount_locale, schema_cache)
+    amount_styles = {i: convert.style for i, convert in enumerate(plan.converters)
+                     if isinstance(convert, AmountParser)}
+    chunks = [(start, end) for start, end in
+              _chunk_boundaries(file_path, _data_start(file_path, layout), chunk_size) if start < end]
+
+    # one chunk in flight per worker plus the one being consumed: a slow consumer
+    # holds the workers back instead of the whole file piling up here
+    window = (workers or os.cpu_count() or 1) + 1
+    pending = collections.deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for start, end in chunks:
+            pending.append(executor.submit(_process_chunk, file_path, start, end, layout["delimiter"],
+                                           plan.headers, amount_styles, encoding, minor_units))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def _head_hash(file_path: str, size: int) -> str:
+    """
+    Hash the first size bytes of a file, which tie a checkpoint to the file it was taken on.
+    """
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read(size)).hexdigest()
+
+def _load_checkpoint(checkpoint_path: str, file_path: str) -> dict:
+    """
+    Return the saved checkpoint, or None when there is none or it belongs to a different file.
+    """
+    try:
+        with open(checkpoint_path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if checkpoint.get("head_hash") != _head_hash(file_path, checkpoint.get("head_size", 0)):
+        return None
+    return checkpoint
+
+def _save_checkpoint(checkpoint_path: str, file_path: str, encoding: str, offset: int, rows: int,
+                     layout: dict, plan: ColumnPlan):
+    """
+    Record that everything before offset has been delivered, with what is needed to carry on from there.
+    """
+    head_size = min(offset, ENCODING_SAMPLE_SIZE)
+    _write_json_atomic(checkpoint_path, {
+        "file": _source_name(file_path),
+        "head_size": head_size,
+        "head_hash": _head_hash(file_path, head_size),
+        "encoding": encoding,
+        "offset": offset,
+        "rows": rows,
+        "layout": layout,
+        "amount_styles": {i: convert.style for i, convert in enumerate(plan.converters)
+                          if isinstance(convert, AmountParser)},
+    })
+
+def _resume_from(checkpoint: dict):
+    """
+    Rebuild the plan, offset and row count saved in a checkpoint.
+    """
+    layout = checkpoint["layout"]
+    plan = ColumnPlan(layout["headers"], {int(i): AmountParser(style)
+                                          for i, style in checkpoint["amount_styles"].items()})
+    return layout, plan, checkpoint["offset"], checkpoint["rows"]
+
+def iter_csv_resumable(file_path: str, checkpoint_path: str, has_header: bool = True,
+                       column_mapping: dict = None, amount_locale: str = 'auto', encoding: str = None,
+                       block_size: int = MMAP_BLOCK_SIZE):
+    """
+    Stream normalized rows from a large file, checkpointing progress so a rerun can resume.
+
+    The data is read in record-aligned blocks of about block_size bytes. Once
+    the consumer has taken every row of a block and asks for more, the block is
+    committed: its end offset, the number of rows so far and the file's layout
+    and amount locales are written to checkpoint_path. A rerun with the same
+    checkpoint skips detection and continues after the last committed block,
+    so a block interrupted mid-way is delivered again in full.
+
+    The checkpoint is tied to the file by a hash of its first bytes; a
+    different file at the same path starts from the beginning.
+    """
+    checkpoint = _load_checkpoint(checkpoint_path, file_path)
+    if checkpoint is None:
+        encoding = _plain_file_encoding(file_path, encoding)
+        with open_source(file_path, encoding) as f:
+            _, plan, layout = _open_csv(f, has_header, column_mapping, amount_locale)
+        offset, row_number = _data_start(file_path, layout), 0
+    else:
+        encoding = checkpoint["encoding"]
+        layout, plan, offset, row_number = _resume_from(checkpoint)
+
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for block_end, text in _iter_mmap_blocks(buf, offset, len(buf), encoding, block_size):
+                for row in _iter_records(_split_block(text, layout["delimiter"]), plan.headers):
+                    yield plan.apply(row)
+                    row_number += 1
+                _save_checkpoint(checkpoint_path, file_path, encoding, block_end, row_number, layout, plan)
+
+def _complete_end(data: bytes) -> int:
+    """
+    Return the length of the leading part of data made of complete records (ending in a newline outside quotes).
+    """
+    newline = data.rfind(b'\n')
+    if newline < 0:
+        return 0
+    if data.count(b'"', 0, newline) % 2 == 0:
+        return newline + 1
+    # the last newline is inside an open quoted field; find the last one outside quotes
+    complete, in_quotes = 0, False
+    for match in _RECORD_TOKEN.finditer(data, 0, newline):
+        if match.group() == b'"':
+            in_quotes = not in_quotes
+        elif not in_quotes:
+            complete = match.end()
+    return complete
+
+# bytes read from the start of a followed file to detect its layout
+FOLLOW_SAMPLE_SIZE = 64 * 1024
+# bytes of a followed file's unprocessed data read at a time
+FOLLOW_READ_SIZE = MMAP_BLOCK_SIZE
+
+def iter_csv_follow(file_path: str, state_path: str = None, has_header: bool = True,
+                    column_mapping: dict = None, amount_locale: str = 'auto', encoding: str = None,
+                    poll_interval: float = 1.0, idle_timeout: float = None):
+    """
+    Follow an append-only CSV file, yielding rows as complete records are appended.
+
+    The delimiter, headers and amount locales are detected once; afterwards
+    only bytes past the last processed offset are read, FOLLOW_READ_SIZE at a
+    time so a large backlog streams out as it is read, and a trailing record
+    still being written (no final newline yet) waits for the next poll. The
+    file is checked every poll_interval seconds, and the generator ends after
+    idle_timeout seconds without new records (never when None).
+
+    With a state_path, the offset, layout and row count are saved after each
+    batch the consumer has fully taken, so a later run picks up where this
+    one stopped. A file that shrinks or no longer matches the state is
+    treated as replaced and read again from the start.
+    """
+    checkpoint = _load_checkpoint(state_path, file_path) if state_path else None
+    if checkpoint is not None:
+        encoding = checkpoint["encoding"]
+        layout, plan, offset, row_number = _resume_from(checkpoint)
+    else:
+        layout = None
+    idle = 0.0
+
+    while True:
+        size = os.path.getsize(file_path)
+        if layout is not None and size < offset:
+            layout = None
+        if layout is None and size > 0:
+            # detect only from complete records: a half-written header or first
+            # row would lock in the wrong columns for good
+            with open(file_path, 'rb') as f:
+                head = f.read(FOLLOW_SAMPLE_SIZE)
+            complete = _complete_end(head)
+            if complete:
+                encoding = _plain_file_encoding(file_path, encoding)
+                sample = io.StringIO(head[:complete].decode(encoding), newline='')
+                _, plan, layout = _open_csv(sample, has_header, column_mapping, amount_locale)
+                offset, row_number = _data_start(file_path, layout), 0
+
+        complete = 0
+        if layout is not None and size > offset:
+            # read the backlog a piece at a time, so a long gap is neither held in
+            # memory at once nor scanned in full before the first row comes out
+            with open(file_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(min(size - offset, FOLLOW_READ_SIZE))
+                complete = _complete_end(data)
+                # a single record longer than the piece: read on until it is complete
+                while not complete and offset + len(data) < size:
+                    data += f.read(min(size - offset - len(data), FOLLOW_READ_SIZE))
+                    complete = _complete_end(data)
+        if complete:
+            for block_end, text in _iter_mmap_blocks(data, 0, complete, encoding):
+                for row in _iter_records(_split_block(text, layout["delimiter"]), plan.headers):
+                    yield plan.apply(row)
+                    row_number += 1
+                if state_path:
+                    _save_checkpoint(state_path, file_path, encoding, offset + block_end, row_number,
+                                     layout, plan)
+            offset += complete
+            idle = 0.0
+            continue
+
+        if idle_timeout is not None and idle >= idle_timeout:
+            return
+        time.sleep(poll_interval)
+        idle += poll_interval
+
+# size of the in-memory Bloom filter in front of a DedupIndex (2 MiB) and hashes per key;
+# about 1% false positives up to 1.75 million transactions
+DEDUP_BLOOM_BITS = 1 << 24
+DEDUP_BLOOM_HASHES = 7
+# rows looked up in a DedupIndex at once
+DEDUP_BATCH_ROWS = 10000
+# keys per lookup query into a DedupIndex
+DEDUP_LOOKUP_KEYS = 500
+
+def transaction_key(row: dict) -> bytes:
+    """
+    Return the 16-byte dedup key of a normalized row: a hash of its date, amount, currency and description.
+
+    Amounts compare by value, so "5.00" and "5.0" (or 500 minor units of a
+    2-digit currency) give the same key.
+    """
+    date = row.get("transaction_date")
+    amount = row.get("amount")
+    if isinstance(amount, int):
+        amount = minor_units_to_decimal(amount, row.get("currency"))
+    parts = (
+        date.isoformat() if isinstance(date, datetime) else str(date),
+        format(amount.normalize(), 'f') if isinstance(amount, Decimal) else str(amount),
+        str(row.get("currency")),
+        str(row.get("description")),
+    )
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).digest()[:16]
+
+class DedupIndex:
+    """
+    Persistent index of transactions already ingested, to drop duplicates across overlapping exports.
+
+    Keys (see transaction_key) are stored in a SQLite file. A Bloom filter,
+    saved in the same file, answers most lookups for new transactions without
+    touching the disk; only rows it reports as possibly seen are checked in
+    the index. Memory stays fixed at the size of the filter however many
+    transactions have been seen. New keys are committed batch by batch; the
+    filter is saved by flush() or close(), and rebuilt from the keys if the
+    process died before that.
+
+    Identical transactions (same date, amount, currency and description) are
+    treated as duplicates, even within one file.
+    """
+
+    def __init__(self, path: str, bloom_bits: int = DEDUP_BLOOM_BITS, hashes: int = DEDUP_BLOOM_HASHES):
+        if bloom_bits < 8 or hashes < 1:
+            raise ValueError("A Bloom filter needs at least 8 bits and one hash")
+        self.path = path
+        self.hashes = hashes
+        self.size = bloom_bits // 8 * 8
+        self.db = sqlite3.connect(path)
+        # commits happen every batch; the write-ahead log keeps them cheap
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS seen (key BLOB PRIMARY KEY) WITHOUT ROWID")
+        self.db.execute("CREATE TABLE IF NOT EXISTS bloom (hashes INTEGER, bits BLOB)")
+        saved = self.db.execute("SELECT hashes, bits FROM bloom").fetchone()
+        self.dirty = not (saved and saved[1] is not None and saved[0] == hashes
+                          and len(saved[1]) * 8 == self.size)
+        if not self.dirty:
+            self.bits = bytearray(saved[1])
+        else:
+            # a new index, or one saved with other filter settings: rebuild from the keys
+            self.bits = bytearray(self.size // 8)
+            for (key,) in self.db.execute("SELECT key FROM seen"):
+                self._set(self._positions(key))
+
+    def _positions(self, key: bytes):
+        # double hashing: the two halves of the key give every position
+        h1, h2 = int.from_bytes(key[:8], 'little'), int.from_bytes(key[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def _set(self, positions: list):
+        for pos in positions:
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def _may_contain(self, positions: list) -> bool:
+        bits = self.bits
+        for pos in positions:
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def _new_rows(self, rows: list) -> list:
+        """
+        Return the rows of a batch not seen before and their keys, adding the keys to the filter.
+        """
+        keys = [transaction_key(row) for row in rows]
+        positions = [self._positions(key) for key in keys]
+        candidates = [key for key, pos in zip(keys, positions) if self._may_contain(pos)]
+        seen = set()
+        # chunked to stay under SQLite's limit on bound parameters (999 before 3.32)
+        for start in range(0, len(candidates), DEDUP_LOOKUP_KEYS):
+            chunk = candidates[start:start + DEDUP_LOOKUP_KEYS]
+            placeholders = ','.join('?' * len(chunk))
+            seen.update(key for (key,) in self.db.execute(
+                f"SELECT key FROM seen WHERE key IN ({placeholders})", chunk))
+        new_rows, new_keys = [], []
+        for row, key, pos in zip(rows, keys, positions):
+            if key not in seen:
+                seen.add(key)
+                new_rows.append(row)
+                new_keys.append((key,))
+                self._set(pos)
+        return new_rows, new_keys
+
+    def _commit(self, new_keys: list):
+        # inserting in key order touches far fewer index pages
+        new_keys.sort()
+        with self.db:
+            if new_keys and not self.dirty:
+                # the saved filter no longer covers every key until the next flush
+                self.db.execute("UPDATE bloom SET bits = NULL")
+                self.dirty = True
+            self.db.executemany("INSERT INTO seen VALUES (?)", new_keys)
+
+    def filter(self, rows):
+        """
+        Yield only the rows not seen before, recording them in the index.
+
+        A batch's keys are committed once the consumer has taken all of its
+        rows, so rows lost to a crash mid-batch are not marked as seen. The
+        filter itself is only saved by flush() or close(), not per call, so
+        many small files do not each rewrite it.
+        """
+        rows = iter(rows)
+        for batch in iter(lambda: list(itertools.islice(rows, DEDUP_BATCH_ROWS)), []):
+            new_rows, new_keys = self._new_rows(batch)
+            yield from new_rows
+            self._commit(new_keys)
+
+    def flush(self):
+        """
+        Save the Bloom filter if keys were added since it was last saved.
+        """
+        if not self.dirty:
+            return
+        with self.db:
+            self.db.execute("DELETE FROM bloom")
+            self.db.execute("INSERT INTO bloom VALUES (?, ?)", (self.hashes, bytes(self.bits)))
+        self.dirty = False
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def process_csv(file_path: str, has_header: bool = True, column_mapping: dict = None,
+                stream: bool = False, columnar: bool = False, batch_size: int = 10000,
+                amount_locale: str = 'auto', workers: int = None, use_mmap: bool = False,
+                as_records: bool = False, schema_cache: SchemaCache = None, encoding: str = None,
+                dedup: DedupIndex = None, minor_units: bool = False):
     """
     Process and normalize CSV files
 
+    file_path may be a path or a file-like object (text or binary); gzip, bz2,
+    xz and zstd compressed input is decompressed while streaming. The
+    encoding is detected from the start of the file unless given.
+
     For files : 
     - with headers: the headers are normalized to snake_case
     - headerless files: the column mapping is inferred dynamically
+    - has_header=None: whether the first row is a header is detected per file
+
+    Amounts are parsed with one numeric locale per file, sampled from the
+    amount column (amount_locale='auto'), declared as 'us' or 'eu', or decided
+    per cell as convert_amount does (amount_locale=None). With
+    minor_units=True they are ints of minor units (cents for most currencies,
+    see CURRENCY_SCALES) instead of Decimals.
+
+    With workers set, row mode splits the file into chunks that are normalized
+    in parallel by that many processes. With use_mmap=True, row mode reads
+    the file through a memory map instead of the io text layer. A SchemaCache
+    lets recurring feeds reuse the layout detected for an earlier file. With
+    a DedupIndex, row mode drops transactions already ingested from any file.
     
     Returns:
-      A list of normalized row dictionaries.
-    """
-    normalized_data = []
-    with open(file_path, newline='', encoding='utf-8') as f:
-        sample = f.read(1024)
-        f.seek(0)
-        delimiter = detect_delimiter(sample)
-        reader = csv.reader(f, delimiter=delimiter)
-        
-        if has_header:
-            headers = next(reader)
-            headers = [snake_case(header) for header in headers]
+      A list of normalized row dictionaries, or a generator of them when stream=True.
+      With as_records=True, rows are compact Transaction records instead of dicts.
+      With columnar=True, a dict of column name -> list of values instead
+      (or a generator of such batches when stream=True).
+    """
+    if columnar and workers:
+        raise ValueError("Parallel processing is only supported in row mode")
+    if columnar and as_records:
+        raise ValueError("Transaction records are only supported in row mode")
+    if columnar and dedup:
+        raise ValueError("Deduplication is only supported in row mode")
+    if columnar:
+        batches = iter_batches(file_path, has_header=has_header, column_mapping=column_mapping,
+                               batch_size=batch_size, amount_locale=amount_locale,
+                               schema_cache=schema_cache, encoding=encoding, minor_units=minor_units)
+        if stream:
+            return batches
+        columns = {}
+        for batch in batches:
+            for key, values in batch.items():
+                columns.setdefault(key, []).extend(values)
+        return columns
+
+    if workers:
+        rows = iter_csv_parallel(file_path, has_header=has_header, column_mapping=column_mapping,
+                                 amount_locale=amount_locale, workers=workers, schema_cache=schema_cache,
+                                 encoding=encoding, minor_units=minor_units)
+    elif use_mmap:
+        rows = iter_csv_mmap(file_path, has_header=has_header, column_mapping=column_mapping,
+                             amount_locale=amount_locale, schema_cache=schema_cache, encoding=encoding,
+                             minor_units=minor_units)
+    else:
+        rows = iter_csv(file_path, has_header=has_header, column_mapping=column_mapping,
+                        amount_locale=amount_locale, schema_cache=schema_cache, encoding=encoding,
+                        minor_units=minor_units)
+    if dedup:
+        rows = dedup.filter(rows)
+    if as_records:
+        rows = map(Transaction.from_dict, rows)
+    if stream:
+        return rows
+    return list(rows)
+
+# marks the end of the rows produced for aiter_csv
+_END_OF_ROWS = object()
+
+async def aiter_csv(source, has_header: bool = True, column_mapping: dict = None,
+                    amount_locale: str = 'auto', batch_size: int = 1000, max_pending: int = 4,
+                    executor=None, encoding: str = None):
+    """
+    Asynchronously stream normalized rows from a CSV file path or file-like object.
+
+    Reading and normalization run off the event loop in an executor (the
+    loop's default one unless given), batch_size rows at a time. The
+    producer shares the queue with the loop, so the executor must run it in
+    a thread of this process (a ThreadPoolExecutor, not a process pool). At
+    most max_pending (at least 1) normalized batches are buffered: when the
+    consumer falls behind, the producer blocks until it catches up.
+
+    Usage:
+      async for row in aiter_csv("export.csv"):
+          ...
+    """
+    if max_pending < 1:
+        raise ValueError(f"max_pending must be at least 1, not {max_pending}")
+    if isinstance(executor, ProcessPoolExecutor):
+        raise ValueError("aiter_csv needs a thread executor; a process pool cannot run its producer")
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=max_pending)
+    stop = threading.Event()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce():
+        try:
+            with open_source(source, encoding) as f:
+                reader, plan, _ = _open_csv(f, has_header, column_mapping, amount_locale)
+                records = _iter_records(reader, plan.headers)
+                while not stop.is_set():
+                    rows = list(itertools.islice(records, batch_size))
+                    if not rows:
+                        break
+                    put([plan.apply(row) for row in rows])
+        except Exception as e:
+            if not stop.is_set():
+                put(e)
+            return
+        if not stop.is_set():
+            put(_END_OF_ROWS)
+
+    producer = loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is _END_OF_ROWS:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            for row in batch:
+                yield row
+    finally:
+        # unblock a producer waiting on a full queue, then let it notice the stop
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()
+        await producer
+
+def _require_pyarrow():
+    """
+    Import pyarrow, which is only needed for Arrow and Parquet output.
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Arrow and Parquet output require pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+def _arrow_batch(pa, batch: dict, amount_scale: int):
+    """
+    Convert a column batch from iter_batches into a typed Arrow record batch.
+    """
+    arrays = []
+    for key, values in batch.items():
+        if key == "transaction_date":
+            arrays.append(pa.array([value.date() for value in values], type=pa.date32()))
+        elif key == "amount":
+            arrays.append(pa.array(values, type=pa.decimal128(38, amount_scale)))
+        elif isinstance(values, DictionaryColumn):
+            arrays.append(pa.DictionaryArray.from_arrays(pa.array(values.codes, type=pa.int32()),
+                                                         pa.array(values.values, type=pa.string())))
         else:
-            # Read the first row and infer column mapping if not provided.
-            first_row = next(reader)
-            if column_mapping is None:
-                mapping = infer_column_mapping(first_row)
+            arrays.append(pa.array(values, type=pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, names=list(batch))
+
+def iter_arrow_batches(file_path: str, has_header: bool = True, column_mapping: dict = None,
+                       batch_size: int = 10000, amount_locale: str = 'auto', amount_scale: int = 2):
+    """
+    Stream normalized data as typed Arrow record batches.
+
+    transaction_date becomes date32, amount decimal128 with amount_scale
+    digits (amounts needing more digits raise instead of being rounded),
+    currency and status dictionary-encoded from the file's symbol tables,
+    other columns utf8.
+    """
+    pa = _require_pyarrow()
+    for batch in iter_batches(file_path, has_header=has_header, column_mapping=column_mapping,
+                              batch_size=batch_size, amount_locale=amount_locale, encode_symbols=True):
+        yield _arrow_batch(pa, batch, amount_scale)
+
+def write_arrow(file_path: str, output_path: str, output_format: str = 'ipc', has_header: bool = True,
+                column_mapping: dict = None, batch_size: int = 10000, amount_locale: str = 'auto',
+                amount_scale: int = 2) -> int:
+    """
+    Normalize a CSV file straight into an Arrow IPC stream ('ipc') or a Parquet file ('parquet').
+
+    Batches are written as they are read, so the whole file is never held in
+    memory. Nothing is written when the file has no data rows.
+
+    Returns:
+      The number of rows written.
+    """
+    pa = _require_pyarrow()
+    if output_format not in ('ipc', 'parquet'):
+        raise ValueError(f"Unknown output format '{output_format}'")
+    writer = None
+    rows = 0
+    try:
+        for batch in iter_arrow_batches(file_path, has_header=has_header, column_mapping=column_mapping,
+                                        batch_size=batch_size, amount_locale=amount_locale,
+                                        amount_scale=amount_scale):
+            if writer is None:
+                if output_format == 'parquet':
+                    import pyarrow.parquet as pq
+                    writer = pq.ParquetWriter(output_path, batch.schema)
+                else:
+                    # the stream format allows each batch its own currency/status dictionary
+                    writer = pa.ipc.new_stream(output_path, batch.schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def _process_file(file_path: str, has_header: bool, amount_locale: str, schema_cache: SchemaCache) -> list:
+    """
+    Normalize a whole file. Runs in a worker process for process_many.
+    """
+    return process_csv(file_path, has_header=has_header, amount_locale=amount_locale,
+                       schema_cache=schema_cache)
+
+def _expand_paths(paths: list) -> list:
+    """
+    Expand directories into the (possibly compressed) CSV files they contain, keeping file paths as given.
+    """
+    expanded = []
+    for path in paths:
+        if os.path.isdir(path):
+            expanded.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                   if name.lower().endswith(CSV_SUFFIXES)))
+        else:
+            expanded.append(path)
+    return expanded
+
+def process_many(paths: list, sink, has_header: bool = None, workers: int = None,
+                 amount_locale: str = 'auto', schema_cache: SchemaCache = None,
+                 dedup: DedupIndex = None) -> dict:
+    """
+    Normalize many files (or directories of CSV files) across a pool of worker processes.
+
+    Each file is handed to sink(file_path, rows) as soon as it completes, in
+    completion order. A failing file does not stop the batch; its error is
+    collected instead. By default whether each file has a header is detected;
+    a SchemaCache shared by the workers skips detection for known feeds.
+    With a DedupIndex, rows already ingested are dropped before the sink sees
+    them; the index is consulted in this process, so workers never share it.
+
+    Returns:
+      A dict mapping the path of every failed file to its error message.
+    """
+    errors = {}
+    remaining = iter(_expand_paths(paths))
+    # at most two files per worker are submitted at a time, topped up as files complete,
+    # so finished row lists are released once the sink has them
+    window = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+
+        def submit(count):
+            for path in itertools.islice(remaining, count):
+                futures[executor.submit(_process_file, path, has_header, amount_locale, schema_cache)] = path
+
+        futures = {}
+        submit(window)
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            submit(len(done))
+            for future in done:
+                path = futures.pop(future)
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    errors[path] = str(e) or type(e).__name__
+                    continue
+                if dedup:
+                    rows = list(dedup.filter(rows))
+                sink(path, rows)
+    return errors
+
+def format_row(row: dict) -> dict:
+    """
+    Return a copy of a normalized row with the date and amount formatted as strings.
+    """
+    formatted_row = row.copy()
+    if isinstance(formatted_row.get("transaction_date"), datetime):
+        formatted_row["transaction_date"] = formatted_row["transaction_date"].strftime('%Y-%m-%d')
+    if isinstance(formatted_row.get("amount"), Decimal):
+        formatted_row["amount"] = f"{formatted_row['amount']:.2f}"
+    elif isinstance(formatted_row.get("amount"), int):
+        formatted_row["amount"] = format_minor_units(formatted_row["amount"], formatted_row.get("currency"))
+    return formatted_row
+
+class JsonLinesSink:
+    """
+    Sink for process_many that writes each row as a JSON line tagged with its source file.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __call__(self, file_path: str, rows: list):
+        for row in rows:
+            record = {"source": file_path, **format_row(row)}
+            self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+class Aggregator:
+    """
+    One-pass group-by over normalized rows, keeping one running total per group instead of the rows.
+
+    Rows are grouped by the values of the fields in by (any normalized field,
+    e.g. "currency" or ("transaction_date", "status") for daily totals), and
+    the value field (the amount by default) is counted and summed exactly,
+    with its minimum and maximum. Rows whose value is None count towards the
+    group's rows but not its sum, min or max. Amounts in different currencies
+    are added together unless currency is one of the group fields; for int
+    minor units (minor_units=True) that would also mix scales, so group by
+    currency and format the totals with format_minor_units.
+
+    An Aggregator is also a sink for process_many.
+    """
+
+    def __init__(self, by, value: str = 'amount'):
+        self.by = (by,) if isinstance(by, str) else tuple(by)
+        if not self.by:
+            raise ValueError("Aggregation needs at least one field to group by")
+        self.value = value
+        # group key -> [rows, values, sum, min, max]
+        self.groups = {}
+
+    def add(self, row: dict):
+        key = tuple(row.get(field) for field in self.by)
+        value = row.get(self.value)
+        totals = self.groups.get(key)
+        if totals is None:
+            totals = self.groups[key] = [0, 0, None, None, None]
+        totals[0] += 1
+        if value is not None:
+            if totals[1]:
+                totals[2] += value
+                if value < totals[3]:
+                    totals[3] = value
+                elif value > totals[4]:
+                    totals[4] = value
             else:
-                mapping = column_mapping
-            # Create headers preserving original order.
-            headers = [mapping[i] for i in range(len(first_row))]
-            # Process the first row as data.
-            normalized_data.append(normalize_row(dict(zip(headers, first_row))))
-        
-        for row in reader:
-            if not row:  # Skip empty rows
-                continue
-            if len(row) != len(headers):
-                print(f"Warning: Mismatched number of columns in row: {row}")
-                continue
-            row_dict = dict(zip(headers, row))
-            normalized_data.append(normalize_row(row_dict))
-    return normalized_data
+                totals[2] = totals[3] = totals[4] = value
+            totals[1] += 1
+
+    def update(self, rows):
+        """
+        Add every row of an iterable (typically a stream from iter_csv) and return the aggregator.
+        """
+        for row in rows:
+            self.add(row)
+        return self
+
+    def __call__(self, file_path: str, rows: list):
+        self.update(rows)
+
+    def result(self) -> list:
+        """
+        Return the result table: one dict per group, with the group fields then count, sum, min and max.
+
+        Groups are sorted by their field values, missing values first.
+        """
+        table = []
+        for key in sorted(self.groups, key=lambda key: [(value is not None, value) for value in key]):
+            rows, _, total, low, high = self.groups[key]
+            table.append({**dict(zip(self.by, key)), "count": rows, "sum": total, "min": low, "max": high})
+        return table
+
+def sum_minor_units(rows) -> dict:
+    """
+    Total the int minor-unit amounts of a row stream per currency, in one pass and without Decimal.
+
+    Returns:
+      A dict mapping each currency to its total in that currency's minor units.
+    """
+    totals = collections.defaultdict(int)
+    for row in rows:
+        amount = row.get("amount")
+        if amount is not None:
+            totals[row.get("currency")] += amount
+    return dict(totals)
+
+def aggregate(rows, by, value: str = 'amount') -> list:
+    """
+    Group a stream of normalized rows in one pass and return the result table (see Aggregator).
+    """
+    return Aggregator(by, value).update(rows).result()
+
+def aggregate_csv(file_path: str, by, value: str = 'amount', has_header: bool = True,
+                  column_mapping: dict = None, amount_locale: str = 'auto', workers: int = None,
+                  use_mmap: bool = False, schema_cache: SchemaCache = None, encoding: str = None,
+                  dedup: DedupIndex = None, minor_units: bool = False) -> list:
+    """
+    Aggregate a CSV file without materializing its rows.
+
+    The options are those of process_csv; the normalized rows are streamed
+    straight into an Aggregator.
+
+    Usage:
+      aggregate_csv("export.csv", by=("currency", "status"))
+    """
+    rows = process_csv(file_path, has_header=has_header, column_mapping=column_mapping, stream=True,
+                       amount_locale=amount_locale, workers=workers, use_mmap=use_mmap,
+                       schema_cache=schema_cache, encoding=encoding, dedup=dedup, minor_units=minor_units)
+    return aggregate(rows, by, value)
 
 def print_normalized_data(data: list):
     """
@@ -212,15 +2164,13 @@ def print_readable_data(data: list):
     Print normalized data in a user-friendly format.
     """
     for row in data:
-        formatted_row = row.copy()
-        if isinstance(formatted_row.get("transaction_date"), datetime):
-            formatted_row["transaction_date"] = formatted_row["transaction_date"].strftime('%Y-%m-%d')
-        if isinstance(formatted_row.get("amount"), Decimal):
-            formatted_row["amount"] = f"{formatted_row['amount']:.2f}"
-        print(formatted_row)
+        print(format_row(row))
 
 
-if __name__ == "__main__":
+def run_demo():
+    """
+    Normalize the sample files shipped with the repository and print them.
+    """
     test_files = [
         {"file": "test1.csv", "has_header": True},
         {"file": "test2.csv", "has_header": True},
@@ -241,3 +2191,38 @@ if __name__ == "__main__":
             print_readable_data(data)
         except Exception as e:
             print(f"An error occurred while processing {file_name}: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normalize transaction CSV files")
+    parser.add_argument("paths", nargs="*", help="CSV files or directories; runs the sample files when omitted")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--output", help="write JSON lines here instead of stdout")
+    parser.add_argument("--schema-cache", help="JSON file caching detected layouts of recurring feeds")
+    parser.add_argument("--dedup-index", help="SQLite file of transactions already ingested, to drop duplicates")
+    parser.add_argument("--group-by", help="comma-separated fields; print count/sum/min/max of amounts per group instead of rows")
+    args = parser.parse_args()
+
+    if not args.paths:
+        run_demo()
+    else:
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            schema_cache = SchemaCache(args.schema_cache) if args.schema_cache else None
+            dedup = DedupIndex(args.dedup_index) if args.dedup_index else None
+            aggregator = Aggregator(args.group_by.split(',')) if args.group_by else None
+            try:
+                errors = process_many(args.paths, aggregator or JsonLinesSink(out), workers=args.workers,
+                                      schema_cache=schema_cache, dedup=dedup)
+            finally:
+                if dedup:
+                    dedup.close()
+            if aggregator:
+                for group in aggregator.result():
+                    out.write(json.dumps(format_row(group), default=str) + "\n")
+        finally:
+            if args.output:
+                out.close()
+        for path, error in errors.items():
+            print(f"An error occurred while processing {path}: {error}", file=sys.stderr)
+        sys.exit(1 if errors else 0)
@@ -0,0 +1,120 @@
+"""
+Byte-offset readers (parallel, mmap, resumable and follow) must return exactly what process_csv does.
+
+The files mix quoted fields with embedded newlines, delimiters and escaped
+quotes, and the chunk and block sizes are kept tiny so that nearly every
+record straddles a split point.
+"""
+import functools
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+
+HEADER = "transaction_date,description,amount,currency,status"
+
+RECORDS = [
+    '2024-01-15,Office Supplies,"1,234.56",USD,Completed',
+    '2024-01-16,"Software\nLicense, annual","2,500.00",EUR,PENDING',
+    '2024-01-17,"Lunch ""team"" meeting\n\nsecond paragraph",1750.50,USD,completed',
+    '2024-01-18,"multi\nline\nwith, commas and ""quotes""\n","3,000.10",JPY,Failed',
+    '2024-01-19,plain,12.00,GBP,pending',
+    '2024-01-20,"""\n""",7.5,USD,completed',
+]
+
+def write_csv(directory: str, name: str, newline: str = "\n", trailing_newline: bool = True,
+              repeat: int = 20) -> str:
+    """
+    Write the sample records (repeated) to a file with the given line ending and return its path.
+    """
+    lines = [HEADER] + RECORDS * repeat
+    text = newline.join(line.replace("\n", newline) for line in lines)
+    if trailing_newline:
+        text += newline
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    return path
+
+class OffsetReaderTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.files = {
+            f"{name} {'' if trailing else 'no '}trailing newline": write_csv(
+                self.dir, f"{name}_{trailing}.csv", newline, trailing)
+            for name, newline in (("LF", "\n"), ("CRLF", "\r\n"))
+            for trailing in (True, False)
+        }
+
+    def assert_matches_process_csv(self, read):
+        for label, path in self.files.items():
+            with self.subTest(label):
+                expected = main.process_csv(path)
+                self.assertEqual(len(expected), len(RECORDS) * 20)
+                self.assertEqual(list(read(path)), expected)
+
+    def test_parallel(self):
+        for chunk_size in (1, 7, 64):
+            with self.subTest(chunk_size=chunk_size):
+                self.assert_matches_process_csv(
+                    lambda path: main.iter_csv_parallel(path, workers=2, chunk_size=chunk_size))
+
+    def test_chunk_boundaries_are_record_starts(self):
+        path = self.files["CRLF no trailing newline"]
+        with open(path, "rb") as f:
+            data = f.read()
+        chunks = main._chunk_boundaries(path, 0, 5)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], len(data))
+        for (_, end), (start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(end, start)
+            # a record starts right after a newline outside quotes
+            self.assertEqual(data[:start].count(b'"') % 2, 0)
+            self.assertEqual(data[start - 1:start], b"\n")
+
+    def test_mmap(self):
+        self.assert_matches_process_csv(main.iter_csv_mmap)
+        for block_size in (1, 7, 64):
+            blocks = functools.partial(main._iter_mmap_blocks, block_size=block_size)
+            with self.subTest(block_size=block_size), mock.patch.object(main, "_iter_mmap_blocks", blocks):
+                self.assert_matches_process_csv(main.iter_csv_mmap)
+
+    def test_resumable(self):
+        for block_size in (1, 7, 64):
+            with self.subTest(block_size=block_size):
+                # a fresh checkpoint per run: a finished one would make the next run yield nothing
+                self.assert_matches_process_csv(lambda path: main.iter_csv_resumable(
+                    path, f"{path}.{block_size}.checkpoint", block_size=block_size))
+
+    def test_resumable_after_interruption(self):
+        for label, path in self.files.items():
+            with self.subTest(label):
+                checkpoint = f"{path}.checkpoint"
+                expected = main.process_csv(path)
+                rows = main.iter_csv_resumable(path, checkpoint, block_size=50)
+                taken = [next(rows) for _ in range(len(expected) // 3)]
+                rows.close()
+                # the rerun repeats the rows of the block that was not committed, then carries on
+                resumed = list(main.iter_csv_resumable(path, checkpoint, block_size=50))
+                committed = len(expected) - len(resumed)
+                self.assertLessEqual(committed, len(taken))
+                self.assertEqual(taken[:committed] + resumed, expected)
+
+    def test_follow(self):
+        for read_size in (1, 7, 64):
+            with self.subTest(read_size=read_size), mock.patch.object(main, "FOLLOW_READ_SIZE", read_size):
+                for label, path in self.files.items():
+                    with self.subTest(label):
+                        expected = main.process_csv(path)
+                        rows = list(main.iter_csv_follow(path, poll_interval=0.01, idle_timeout=0))
+                        if label.endswith("no trailing newline"):
+                            # the last record may still be being written, so it is held back
+                            expected = expected[:-1]
+                        self.assertEqual(rows, expected)
+
+if __name__ == "__main__":
+    unittest.main()